@@ -1,11 +1,222 @@
 import streamlit as st
 import os
-import json
-import pandas as pd
+import uuid
+import logging
+import hashlib
+import diskcache
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, Optional
 import github_refactor_analyzer as github_analyzer
 import gemini_refactor_engine as refactor_engine
-import refactor_report_generator as report_gen
+
+# Analysis focus checkboxes as (option key, label, default, help text)
+ANALYSIS_FOCUS_OPTIONS = (
+    ('performance', "Performance Optimizations", True, "Analyze loops, algorithms, and API calls"),
+    ('maintainability', "Code Maintainability", True, "Suggest improvements for readability and structure"),
+    ('design_patterns', "Design Patterns", True, "Identify better architectural patterns"),
+    ('code_quality', "Code Quality", True, "Find code smells and best practices"),
+    ('security', "Security Issues", True, "Identify potential security vulnerabilities"),
+    ('modularity', "Modularity Improvements", True, "Suggest better separation of concerns")
+)
+
+EXAMPLE_REPOS = (
+    {
+        "name": "Quill Editor",
+        "url": "https://github.com/slab/quill",
+        "description": "Modern WYSIWYG editor"
+    },
+)
+
+# Rendering schema for each suggestion category. Suggestion expanders show, in order:
+# fields (label, key, default, as_code), sections always shown with a default,
+# code blocks, optional notes and bullet lists.
+SUGGESTION_SCHEMAS = {
+    'performance': {
+        'tab_label': "🚀 Performance",
+        'header': "🚀 Performance Optimization Suggestions",
+        'name': "performance",
+        'metrics_key': 'overall_score',
+        'metrics': [
+            ("Performance Score", 'overall_score', 'N/A', "/10"),
+            ("Issues Found", 'issues_count', 0, ""),
+            ("Optimizable Files", 'optimizable_files', 0, "")
+        ],
+        'icon': "📈",
+        'title_key': 'title',
+        'fallback_title': "Performance Issue",
+        'fields': [("File", 'file', 'Unknown', True), ("Priority", 'priority', 'Medium', False),
+                   ("Impact", 'impact', 'Unknown', False)],
+        'sections': [("Issue Description", 'description', 'No description available')],
+        'code_blocks': [("Current Code", 'before_code'), ("Optimized Code", 'after_code')],
+        'notes': [("Why This Helps", 'explanation')],
+        'lists': []
+    },
+    'maintainability': {
+        'tab_label': "🔧 Maintainability",
+        'header': "🔧 Code Maintainability Improvements",
+        'name': "maintainability",
+        'metrics_key': 'metrics',
+        'nested_metrics': True,
+        'metrics': [
+            ("Maintainability Index", 'maintainability_index', 'N/A', ""),
+            ("Complex Functions", 'complex_functions', 0, ""),
+            ("Long Files", 'long_files', 0, ""),
+            ("Duplicate Code", 'duplicate_percentage', 'N/A', "")
+        ],
+        'icon': "🔧",
+        'title_key': 'title',
+        'fallback_title': "Maintainability Issue",
+        'fields': [("File", 'file', 'Unknown', True), ("Category", 'category', 'General', False),
+                   ("Effort", 'effort', 'Medium', False)],
+        'sections': [("Recommendation", 'description', 'No description available')],
+        'code_blocks': [("Current Approach", 'current_approach'), ("Improved Approach", 'improved_approach')],
+        'notes': [],
+        'lists': [("Benefits", 'benefits')]
+    },
+    'design_patterns': {
+        'tab_label': "🏗️ Design Patterns",
+        'header': "🏗️ Design Pattern Recommendations",
+        'name': "design pattern",
+        'table': ('patterns_found', "Existing Patterns Detected", "No established design patterns detected"),
+        'icon': "🏗️",
+        'title_key': 'pattern_name',
+        'fallback_title': "Pattern Suggestion",
+        'fields': [("Pattern", 'pattern_name', 'Unknown', False), ("File/Module", 'file', 'Unknown', True),
+                   ("Complexity", 'complexity', 'Medium', False)],
+        'sections': [("Current Structure", 'current_structure', 'No description available'),
+                     ("Recommended Pattern", 'recommended_pattern', 'No recommendation available')],
+        'code_blocks': [("Example Implementation", 'example_implementation')],
+        'notes': [],
+        'lists': [("Benefits of This Pattern", 'benefits')]
+    },
+    'code_quality': {
+        'tab_label': "✨ Code Quality",
+        'header': "✨ Code Quality Enhancements",
+        'name': "code quality",
+        'metrics_key': 'quality_score',
+        'metrics': [
+            ("Overall Quality", 'quality_score', 'N/A', "/10"),
+            ("Code Smells", 'code_smells_count', 0, ""),
+            ("Style Issues", 'style_issues', 0, "")
+        ],
+        'icon': "✨",
+        'title_key': 'title',
+        'fallback_title': "Code Quality Issue",
+        'fields': [("File", 'file', 'Unknown', True), ("Issue Type", 'issue_type', 'General', False),
+                   ("Severity", 'severity', 'Medium', False)],
+        'sections': [("Issue Description", 'description', 'No description available')],
+        'code_blocks': [("Problematic Code", 'problematic_code'), ("Improved Code", 'improved_code')],
+        'notes': [("Why This Matters", 'explanation')],
+        'lists': []
+    },
+    'security': {
+        'tab_label': "🔒 Security",
+        'header': "🔒 Security Recommendations",
+        'name': "security",
+        'metrics_key': 'security_score',
+        'metrics': [
+            ("Security Score", 'security_score', 'N/A', "/10"),
+            ("Vulnerabilities", 'vulnerabilities_count', 0, ""),
+            ("High Risk Issues", 'high_risk_issues', 0, "")
+        ],
+        'icon': "🔒",
+        'title_key': 'title',
+        'fallback_title': "Security Issue",
+        'fields': [("File", 'file', 'Unknown', True), ("Risk Level", 'risk_level', 'Medium', False),
+                   ("Vulnerability Type", 'vulnerability_type', 'General', False)],
+        'sections': [("Security Issue", 'description', 'No description available')],
+        'code_blocks': [("Vulnerable Code", 'vulnerable_code'), ("Secure Code", 'secure_code')],
+        'notes': [],
+        'lists': [("Mitigation Steps", 'mitigation_steps')]
+    },
+    'modularity': {
+        'tab_label': "📦 Modularity",
+        'header': "📦 Modularity Improvements",
+        'name': "modularity",
+        'metrics_key': 'cohesion_score',
+        'metrics': [
+            ("Cohesion Score", 'cohesion_score', 'N/A', "/10"),
+            ("Coupling Issues", 'coupling_issues', 0, ""),
+            ("Modules Analyzed", 'modules_count', 0, "")
+        ],
+        'icon': "📦",
+        'title_key': 'title',
+        'fallback_title': "Modularity Issue",
+        'fields': [("Module/File", 'file', 'Unknown', True), ("Issue Type", 'issue_type', 'General', False),
+                   ("Impact", 'impact', 'Medium', False)],
+        'sections': [("Current Structure", 'current_structure', 'No description available'),
+                     ("Recommended Refactoring", 'recommended_refactoring', 'No recommendation available')],
+        'code_blocks': [("Example Refactoring", 'example_refactoring')],
+        'notes': [],
+        'lists': [("Benefits", 'benefits')]
+    }
+}
+
+# Persistent cache of repository structures and analysis results, shared across sessions and server restarts
+analysis_cache = diskcache.Cache('.cache/refactor')
+ANALYSIS_CACHE_EXPIRY = 7 * 24 * 60 * 60  # One week
+
+# Seconds between status checks of a report that is still generating
+REPORT_POLL_INTERVAL = 0.5
+
+def commit_cache_key(repo_info: Dict[str, str], *parts: Any) -> Optional[str]:
+    """Build the disk cache key for data derived from a repository at its current commit."""
+    if not repo_info.get('default_sha'):
+        return None
+    
+    key = f"{repo_info['owner']}/{repo_info['name']}@{repo_info['default_sha']}:" + ":".join(map(repr, parts))
+    return hashlib.sha256(key.encode()).hexdigest()
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def initialize_clients(gemini_api_key: str, github_token: Optional[str]):
+    """Initialize the GitHub and Gemini clients once per set of credentials."""
+    github_analyzer.initialize_clients(gemini_api_key, github_token)
+    refactor_engine.initialize_gemini(gemini_api_key)
+
+@st.cache_data(ttl=600, show_spinner=False)
+def validate_repository(github_url: str, github_token: Optional[str]) -> Dict[str, str]:
+    """Validate a repository, caching successful lookups per URL and token."""
+    repo_info = github_analyzer.validate_repository(github_url)
+    if repo_info is None:
+        # Raising keeps failures (possibly transient) out of the cache
+        raise ValueError(f"Repository not accessible: {github_url}")
+    return repo_info
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def fetch_repository(github_url: str, scope_key: tuple, ref: str, github_token: Optional[str]) -> Dict[str, Any]:
+    """Fetch repository files, caching the result per URL, scope, ref and token."""
+    return github_analyzer.fetch_repository_for_refactoring(github_url, dict(scope_key), ref)
+
+@st.cache_data(show_spinner=False)
+def suggestions_to_json(suggestions: Dict[str, Any]) -> str:
+    """Serialize suggestions to indented JSON, using orjson when it is installed."""
+    try:
+        import orjson
+    except ImportError:
+        import json
+        return json.dumps(suggestions, indent=2)
+    
+    return orjson.dumps(suggestions, option=orjson.OPT_INDENT_2).decode()
+
+def generate_pdf_report(suggestions: Dict[str, Any], repo_info: Dict[str, str], analysis_options: Dict[str, bool]) -> bytes:
+    """Generate the PDF report bytes."""
+    import refactor_report_generator as report_gen
+    return report_gen.generate_pdf_report(suggestions, repo_info, analysis_options).getvalue()
+
+def generate_excel_report(suggestions: Dict[str, Any], repo_info: Dict[str, str]) -> bytes:
+    """Generate the Excel report bytes."""
+    import refactor_report_generator as report_gen
+    return report_gen.generate_excel_report(suggestions, repo_info).getvalue()
+
+def generate_markdown_report(suggestions: Dict[str, Any], repo_info: Dict[str, str], analysis_options: Dict[str, bool]) -> str:
+    """Generate the Markdown report."""
+    import refactor_report_generator as report_gen
+    return report_gen.generate_markdown_report(suggestions, repo_info, analysis_options)
+
+@st.cache_resource(show_spinner=False)
+def get_report_executor() -> ThreadPoolExecutor:
+    """Shared worker pool so report generation doesn't block the script run."""
+    return ThreadPoolExecutor(max_workers=3)
 
 def main():
     st.set_page_config(
@@ -39,12 +250,8 @@ def main():
         # Analysis Options
         st.subheader("🎯 Analysis Focus")
         analysis_options = {
-            'performance': st.checkbox("Performance Optimizations", value=True, help="Analyze loops, algorithms, and API calls"),
-            'maintainability': st.checkbox("Code Maintainability", value=True, help="Suggest improvements for readability and structure"),
-            'design_patterns': st.checkbox("Design Patterns", value=True, help="Identify better architectural patterns"),
-            'code_quality': st.checkbox("Code Quality", value=True, help="Find code smells and best practices"),
-            'security': st.checkbox("Security Issues", value=True, help="Identify potential security vulnerabilities"),
-            'modularity': st.checkbox("Modularity Improvements", value=True, help="Suggest better separation of concerns")
+            key: st.checkbox(label, value=default, help=help_text)
+            for key, label, default, help_text in ANALYSIS_FOCUS_OPTIONS
         }
     
     # Main content area
@@ -88,8 +295,8 @@ def main():
             
             try:
                 # Initialize analyzers
-                github_analyzer.initialize_clients(gemini_api_key, github_token if github_token else None)
-                refactor_engine.initialize_gemini(gemini_api_key)
+                github_token = github_token if github_token else None
+                initialize_clients(gemini_api_key, github_token)
                 
                 # Progress tracking
                 progress_bar = st.progress(0)
@@ -99,7 +306,11 @@ def main():
                 status_text.text("🔍 Validating repository...")
                 progress_bar.progress(10)
                 
-                repo_info = github_analyzer.validate_repository(github_url)
+                try:
+                    repo_info = validate_repository(github_url, github_token)
+                except ValueError:
+                    repo_info = None
+                
                 if not repo_info:
                     st.error("❌ Invalid repository URL or repository not accessible")
                     return
@@ -117,21 +328,67 @@ def main():
                     'include_config': include_config
                 }
                 
-                repo_structure = github_analyzer.fetch_repository_for_refactoring(github_url, scope_options)
+                structure_key = commit_cache_key(repo_info, 'structure', sorted(scope_options.items()))
+                repo_structure = analysis_cache.get(structure_key) if structure_key else None
+                
+                fetch_complete = True
+                if repo_structure is None:
+                    ref = repo_info.get('default_sha') or repo_info['default_branch']
+                    scope_key = tuple(sorted(scope_options.items()))
+                    repo_structure = fetch_repository(github_url, scope_key, ref, github_token)
+                    
+                    # Only keep complete fetches; a partial one is retried on the next run
+                    fetch_complete = github_analyzer.is_fetch_complete(repo_structure)
+                    if not fetch_complete:
+                        fetch_repository.clear(github_url, scope_key, ref, github_token)
+                    elif structure_key:
+                        analysis_cache.set(structure_key, repo_structure, expire=ANALYSIS_CACHE_EXPIRY)
                 
                 # Show repository stats
                 stats = repo_structure['statistics']
                 st.info(f"📊 Found {stats['total_files']} files, analyzing {stats['analyzed_files']} key files (skipped {stats['skipped_files']} files)")
+                if stats.get('failed_files') or stats.get('failed_directories'):
+                    st.warning(f"⚠️ Could not download {stats['failed_files']} files and list {stats['failed_directories']} "
+                               f"directories; results may be incomplete")
                 
                 # Step 3: Generate refactoring suggestions
                 status_text.text("🤖 Analyzing code with Gemini 2.5 Pro...")
                 progress_bar.progress(60)
                 
-                refactor_suggestions = refactor_engine.generate_refactor_suggestions(
-                    repo_structure, 
-                    analysis_options,
-                    repo_info
-                )
+                cache_key = commit_cache_key(repo_info, 'suggestions', refactor_engine.PROMPT_VERSION,
+                                             sorted(analysis_options.items()), sorted(scope_options.items()))
+                refactor_suggestions = analysis_cache.get(cache_key) if cache_key else None
+                
+                if refactor_suggestions is not None:
+                    status_text.text("♻️ Reusing cached analysis for this commit...")
+                else:
+                    # Show each category's results as soon as it has streamed in
+                    enabled_count = sum(1 for enabled in analysis_options.values() if enabled)
+                    category_placeholders = {}
+                    live_results = st.empty()
+                    live_container = live_results.container()
+                    
+                    def on_section(category: str, data: Any):
+                        if category not in SUGGESTION_SCHEMAS or not isinstance(data, dict):
+                            return
+                        if category not in category_placeholders:
+                            category_placeholders[category] = live_container.empty()
+                            progress_bar.progress(60 + 30 * len(category_placeholders) // enabled_count)
+                            status_text.text(f"🤖 Receiving {category.replace('_', ' ')} suggestions "
+                                             f"({len(category_placeholders)}/{enabled_count})...")
+                        with category_placeholders[category].container():
+                            display_category_suggestions(category, data)
+                    
+                    refactor_suggestions = refactor_engine.generate_refactor_suggestions(
+                        repo_structure, 
+                        analysis_options,
+                        repo_info,
+                        on_section=on_section
+                    )
+                    live_results.empty()
+                    
+                    if cache_key and fetch_complete and 'error' not in refactor_suggestions:
+                        analysis_cache.set(cache_key, refactor_suggestions, expire=ANALYSIS_CACHE_EXPIRY)
                 
                 # Step 4: Process and organize suggestions
                 status_text.text("📋 Organizing suggestions...")
@@ -141,15 +398,23 @@ def main():
                 st.session_state.refactor_suggestions = refactor_suggestions
                 st.session_state.repo_info = repo_info
                 st.session_state.analysis_options = analysis_options
+                st.session_state.tab_layout = build_tab_layout(analysis_options)
+                st.session_state.report_futures = {}
                 
                 progress_bar.progress(100)
                 status_text.text("✅ Analysis complete!")
                 
-                st.success("🎉 Refactoring analysis completed successfully!")
+                # Failed batches leave their files out of the merged results
+                if 'error' in refactor_suggestions:
+                    st.warning(f"⚠️ Part of the analysis failed and results may be incomplete: {refactor_suggestions['error']}")
+                else:
+                    st.success("🎉 Refactoring analysis completed successfully!")
                 
             except Exception as e:
-                st.error(f"❌ Error during analysis: {str(e)}")
-                st.exception(e)
+                # Keep the traceback in the server log; show only a reference to the user
+                error_id = uuid.uuid4().hex[:8]
+                logging.exception(f"Analysis failed (id={error_id})")
+                st.error(f"❌ Error during analysis (id={error_id}): {str(e)}")
     
     with col2:
 
@@ -165,15 +430,7 @@ def main():
         """)
 
         st.subheader("💡 Quick Examples")        
-        example_repos = [
-            {
-                "name": "Quill Editor",
-                "url": "https://github.com/slab/quill",
-                "description": "Modern WYSIWYG editor"
-            }
-        ]
-
-        for repo in example_repos:
+        for repo in EXAMPLE_REPOS:
             if st.button(f"📁 {repo['name']}", key=repo['url']):
                 st.text((f"📄 {repo['url']}"))
     
@@ -182,425 +439,226 @@ def main():
         st.markdown("---")
         st.header("📋 Refactoring Suggestions")
         
-        # Create tabs for different suggestion categories
-        suggestion_tabs = []
-        if st.session_state.analysis_options.get('performance'):
-            suggestion_tabs.append("🚀 Performance")
-        if st.session_state.analysis_options.get('maintainability'):
-            suggestion_tabs.append("🔧 Maintainability")
-        if st.session_state.analysis_options.get('design_patterns'):
-            suggestion_tabs.append("🏗️ Design Patterns")
-        if st.session_state.analysis_options.get('code_quality'):
-            suggestion_tabs.append("✨ Code Quality")
-        if st.session_state.analysis_options.get('security'):
-            suggestion_tabs.append("🔒 Security")
-        if st.session_state.analysis_options.get('modularity'):
-            suggestion_tabs.append("📦 Modularity")
-        
-        suggestion_tabs.append("📊 Summary")
-        suggestion_tabs.append("💾 Export")
-        
-        tabs = st.tabs(suggestion_tabs)
+        # Create tabs for the enabled suggestion categories
+        enabled_categories, tab_labels = st.session_state.tab_layout
+        tabs = st.tabs(tab_labels)
         suggestions = st.session_state.refactor_suggestions
         
-        tab_index = 0
-        
-        # Performance tab
-        if st.session_state.analysis_options.get('performance'):
-            with tabs[tab_index]:
-                display_performance_suggestions(suggestions.get('performance', {}))
-            tab_index += 1
-        
-        # Maintainability tab
-        if st.session_state.analysis_options.get('maintainability'):
-            with tabs[tab_index]:
-                display_maintainability_suggestions(suggestions.get('maintainability', {}))
-            tab_index += 1
-        
-        # Design Patterns tab
-        if st.session_state.analysis_options.get('design_patterns'):
-            with tabs[tab_index]:
-                display_design_pattern_suggestions(suggestions.get('design_patterns', {}))
-            tab_index += 1
-        
-        # Code Quality tab
-        if st.session_state.analysis_options.get('code_quality'):
-            with tabs[tab_index]:
-                display_code_quality_suggestions(suggestions.get('code_quality', {}))
-            tab_index += 1
-        
-        # Security tab
-        if st.session_state.analysis_options.get('security'):
-            with tabs[tab_index]:
-                display_security_suggestions(suggestions.get('security', {}))
-            tab_index += 1
-        
-        # Modularity tab
-        if st.session_state.analysis_options.get('modularity'):
-            with tabs[tab_index]:
-                display_modularity_suggestions(suggestions.get('modularity', {}))
-            tab_index += 1
+        for tab, category in zip(tabs, enabled_categories):
+            with tab:
+                display_category_suggestions(category, suggestions.get(category, {}))
         
         # Summary tab
-        with tabs[tab_index]:
+        with tabs[-2]:
             display_summary_tab(suggestions)
-        tab_index += 1
         
         # Export tab
-        with tabs[tab_index]:
+        with tabs[-1]:
             display_export_tab()
 
-def display_performance_suggestions(performance_data: Dict[str, Any]):
-    """Display performance optimization suggestions."""
-    st.subheader("🚀 Performance Optimization Suggestions")
-    
-    if not performance_data:
-        st.info("No performance suggestions found or performance analysis was not selected.")
-        return
-    
-    # Display overall performance score if available
-    if 'overall_score' in performance_data:
-        col1, col2, col3 = st.columns(3)
-        col1.metric("Performance Score", f"{performance_data['overall_score']}/10")
-        col2.metric("Issues Found", performance_data.get('issues_count', 0))
-        col3.metric("Optimizable Files", performance_data.get('optimizable_files', 0))
-    
-    # Display specific suggestions
-    if 'suggestions' in performance_data:
-        for i, suggestion in enumerate(performance_data['suggestions']):
-            with st.expander(f"📈 {suggestion.get('title', f'Performance Issue #{i+1}')}"):
-                st.markdown(f"**File:** `{suggestion.get('file', 'Unknown')}`")
-                st.markdown(f"**Priority:** {suggestion.get('priority', 'Medium')}")
-                st.markdown(f"**Impact:** {suggestion.get('impact', 'Unknown')}")
-                
-                st.markdown("**Issue Description:**")
-                st.markdown(suggestion.get('description', 'No description available'))
-                
-                if 'before_code' in suggestion:
-                    st.markdown("**Current Code:**")
-                    st.code(suggestion['before_code'], language=suggestion.get('language', 'text'))
-                
-                if 'after_code' in suggestion:
-                    st.markdown("**Optimized Code:**")
-                    st.code(suggestion['after_code'], language=suggestion.get('language', 'text'))
-                
-                if 'explanation' in suggestion:
-                    st.markdown("**Why This Helps:**")
-                    st.markdown(suggestion['explanation'])
-
-def display_maintainability_suggestions(maintainability_data: Dict[str, Any]):
-    """Display maintainability improvement suggestions."""
-    st.subheader("🔧 Code Maintainability Improvements")
-    
-    if not maintainability_data:
-        st.info("No maintainability suggestions found or maintainability analysis was not selected.")
-        return
-    
-    # Display maintainability metrics
-    if 'metrics' in maintainability_data:
-        metrics = maintainability_data['metrics']
-        col1, col2, col3, col4 = st.columns(4)
-        col1.metric("Maintainability Index", metrics.get('maintainability_index', 'N/A'))
-        col2.metric("Complex Functions", metrics.get('complex_functions', 0))
-        col3.metric("Long Files", metrics.get('long_files', 0))
-        col4.metric("Duplicate Code", metrics.get('duplicate_percentage', 'N/A'))
-    
-    # Display suggestions
-    if 'suggestions' in maintainability_data:
-        for i, suggestion in enumerate(maintainability_data['suggestions']):
-            with st.expander(f"🔧 {suggestion.get('title', f'Maintainability Issue #{i+1}')}"):
-                st.markdown(f"**File:** `{suggestion.get('file', 'Unknown')}`")
-                st.markdown(f"**Category:** {suggestion.get('category', 'General')}")
-                st.markdown(f"**Effort:** {suggestion.get('effort', 'Medium')}")
-                
-                st.markdown("**Recommendation:**")
-                st.markdown(suggestion.get('description', 'No description available'))
-                
-                if 'current_approach' in suggestion:
-                    st.markdown("**Current Approach:**")
-                    st.code(suggestion['current_approach'], language=suggestion.get('language', 'text'))
-                
-                if 'improved_approach' in suggestion:
-                    st.markdown("**Improved Approach:**")
-                    st.code(suggestion['improved_approach'], language=suggestion.get('language', 'text'))
-                
-                if 'benefits' in suggestion and isinstance(suggestion['benefits'], list):
-                    st.markdown("**Benefits:**")
-                    for benefit in suggestion['benefits']:
-                        st.markdown(f"- {benefit}")
+def build_tab_layout(analysis_options: Dict[str, bool]) -> tuple:
+    """Build the enabled categories and tab labels for a set of analysis options."""
+    enabled_categories = [category for category in SUGGESTION_SCHEMAS if analysis_options.get(category)]
+    tab_labels = [SUGGESTION_SCHEMAS[category]['tab_label'] for category in enabled_categories]
+    tab_labels += ["📊 Summary", "💾 Export"]
+    return enabled_categories, tab_labels
 
-def display_design_pattern_suggestions(design_patterns_data: Dict[str, Any]):
-    """Display design pattern improvement suggestions."""
-    st.subheader("🏗️ Design Pattern Recommendations")
+def display_category_suggestions(category: str, category_data: Dict[str, Any]):
+    """Display the suggestions for one analysis category using its rendering schema."""
+    schema = SUGGESTION_SCHEMAS[category]
+    st.subheader(schema['header'])
     
-    if not design_patterns_data:
-        st.info("No design pattern suggestions found or design pattern analysis was not selected.")
+    if not category_data:
+        st.info(f"No {schema['name']} suggestions found or {schema['name']} analysis was not selected.")
         return
     
-    # Display pattern usage overview
-    if 'patterns_found' in design_patterns_data:
-        st.markdown("**Existing Patterns Detected:**")
-        patterns = design_patterns_data['patterns_found']
-        if patterns:
-            df = pd.DataFrame(patterns)
-            st.dataframe(df, use_container_width=True)
+    # Display category metrics if available
+    if schema.get('metrics_key') in category_data:
+        metrics = category_data[schema['metrics_key']] if schema.get('nested_metrics') else category_data
+        columns = st.columns(len(schema['metrics']))
+        for column, (label, key, default, suffix) in zip(columns, schema['metrics']):
+            value = metrics.get(key, default)
+            column.metric(label, f"{value}{suffix}" if suffix else value)
+    
+    # Display overview table if available
+    if 'table' in schema and schema['table'][0] in category_data:
+        table_key, table_label, empty_message = schema['table']
+        st.markdown(f"**{table_label}:**")
+        if category_data[table_key]:
+            st.dataframe(category_data[table_key], use_container_width=True)
         else:
-            st.info("No established design patterns detected")
+            st.info(empty_message)
     
     # Display suggestions
-    if 'suggestions' in design_patterns_data:
-        for i, suggestion in enumerate(design_patterns_data['suggestions']):
-            with st.expander(f"🏗️ {suggestion.get('pattern_name', f'Pattern Suggestion #{i+1}')}"):
-                st.markdown(f"**Pattern:** {suggestion.get('pattern_name', 'Unknown')}")
-                st.markdown(f"**File/Module:** `{suggestion.get('file', 'Unknown')}`")
-                st.markdown(f"**Complexity:** {suggestion.get('complexity', 'Medium')}")
-                
-                st.markdown("**Current Structure:**")
-                st.markdown(suggestion.get('current_structure', 'No description available'))
-                
-                st.markdown("**Recommended Pattern:**")
-                st.markdown(suggestion.get('recommended_pattern', 'No recommendation available'))
-                
-                if 'example_implementation' in suggestion:
-                    st.markdown("**Example Implementation:**")
-                    st.code(suggestion['example_implementation'], language=suggestion.get('language', 'text'))
-                
-                if 'benefits' in suggestion and isinstance(suggestion['benefits'], list):
-                    st.markdown("**Benefits of This Pattern:**")
-                    for benefit in suggestion['benefits']:
-                        st.markdown(f"- {benefit}")
-
-def display_code_quality_suggestions(code_quality_data: Dict[str, Any]):
-    """Display code quality improvement suggestions."""
-    st.subheader("✨ Code Quality Enhancements")
-    
-    if not code_quality_data:
-        st.info("No code quality suggestions found or code quality analysis was not selected.")
-        return
-    
-    # Display quality metrics
-    if 'quality_score' in code_quality_data:
-        col1, col2, col3 = st.columns(3)
-        col1.metric("Overall Quality", f"{code_quality_data['quality_score']}/10")
-        col2.metric("Code Smells", code_quality_data.get('code_smells_count', 0))
-        col3.metric("Style Issues", code_quality_data.get('style_issues', 0))
-    
-    # Display suggestions
-    if 'suggestions' in code_quality_data:
-        for i, suggestion in enumerate(code_quality_data['suggestions']):
-            with st.expander(f"✨ {suggestion.get('title', f'Code Quality Issue #{i+1}')}"):
-                st.markdown(f"**File:** `{suggestion.get('file', 'Unknown')}`")
-                st.markdown(f"**Issue Type:** {suggestion.get('issue_type', 'General')}")
-                st.markdown(f"**Severity:** {suggestion.get('severity', 'Medium')}")
-                
-                st.markdown("**Issue Description:**")
-                st.markdown(suggestion.get('description', 'No description available'))
-                
-                if 'problematic_code' in suggestion:
-                    st.markdown("**Problematic Code:**")
-                    st.code(suggestion['problematic_code'], language=suggestion.get('language', 'text'))
-                
-                if 'improved_code' in suggestion:
-                    st.markdown("**Improved Code:**")
-                    st.code(suggestion['improved_code'], language=suggestion.get('language', 'text'))
-                
-                if 'explanation' in suggestion:
-                    st.markdown("**Why This Matters:**")
-                    st.markdown(suggestion['explanation'])
-
-def display_security_suggestions(security_data: Dict[str, Any]):
-    """Display security improvement suggestions."""
-    st.subheader("🔒 Security Recommendations")
-    
-    if not security_data:
-        st.info("No security suggestions found or security analysis was not selected.")
-        return
-    
-    # Display security overview
-    if 'security_score' in security_data:
-        col1, col2, col3 = st.columns(3)
-        col1.metric("Security Score", f"{security_data['security_score']}/10")
-        col2.metric("Vulnerabilities", security_data.get('vulnerabilities_count', 0))
-        col3.metric("High Risk Issues", security_data.get('high_risk_issues', 0))
-    
-    # Display suggestions
-    if 'suggestions' in security_data:
-        for i, suggestion in enumerate(security_data['suggestions']):
-            with st.expander(f"🔒 {suggestion.get('title', f'Security Issue #{i+1}')}"):
-                st.markdown(f"**File:** `{suggestion.get('file', 'Unknown')}`")
-                st.markdown(f"**Risk Level:** {suggestion.get('risk_level', 'Medium')}")
-                st.markdown(f"**Vulnerability Type:** {suggestion.get('vulnerability_type', 'General')}")
-                
-                st.markdown("**Security Issue:**")
-                st.markdown(suggestion.get('description', 'No description available'))
-                
-                if 'vulnerable_code' in suggestion:
-                    st.markdown("**Vulnerable Code:**")
-                    st.code(suggestion['vulnerable_code'], language=suggestion.get('language', 'text'))
-                
-                if 'secure_code' in suggestion:
-                    st.markdown("**Secure Code:**")
-                    st.code(suggestion['secure_code'], language=suggestion.get('language', 'text'))
-                
-                if 'mitigation_steps' in suggestion and isinstance(suggestion['mitigation_steps'], list):
-                    st.markdown("**Mitigation Steps:**")
-                    for step in suggestion['mitigation_steps']:
-                        st.markdown(f"- {step}")
-
-def display_modularity_suggestions(modularity_data: Dict[str, Any]):
-    """Display modularity improvement suggestions."""
-    st.subheader("📦 Modularity Improvements")
-    
-    if not modularity_data:
-        st.info("No modularity suggestions found or modularity analysis was not selected.")
-        return
-    
-    # Display modularity metrics
-    if 'cohesion_score' in modularity_data:
-        col1, col2, col3 = st.columns(3)
-        col1.metric("Cohesion Score", f"{modularity_data['cohesion_score']}/10")
-        col2.metric("Coupling Issues", modularity_data.get('coupling_issues', 0))
-        col3.metric("Modules Analyzed", modularity_data.get('modules_count', 0))
-    
-    # Display suggestions
-    if 'suggestions' in modularity_data:
-        for i, suggestion in enumerate(modularity_data['suggestions']):
-            with st.expander(f"📦 {suggestion.get('title', f'Modularity Issue #{i+1}')}"):
-                st.markdown(f"**Module/File:** `{suggestion.get('file', 'Unknown')}`")
-                st.markdown(f"**Issue Type:** {suggestion.get('issue_type', 'General')}")
-                st.markdown(f"**Impact:** {suggestion.get('impact', 'Medium')}")
-                
-                st.markdown("**Current Structure:**")
-                st.markdown(suggestion.get('current_structure', 'No description available'))
-                
-                st.markdown("**Recommended Refactoring:**")
-                st.markdown(suggestion.get('recommended_refactoring', 'No recommendation available'))
-                
-                if 'example_refactoring' in suggestion:
-                    st.markdown("**Example Refactoring:**")
-                    st.code(suggestion['example_refactoring'], language=suggestion.get('language', 'text'))
-                
-                if 'benefits' in suggestion and isinstance(suggestion['benefits'], list):
-                    st.markdown("**Benefits:**")
-                    for benefit in suggestion['benefits']:
-                        st.markdown(f"- {benefit}")
+    if 'suggestions' in category_data:
+        suggestions_list = category_data['suggestions']
+        icon, title_key, fallback_title = schema['icon'], schema['title_key'], schema['fallback_title']
+        headers = [f"{icon} {suggestion.get(title_key) or f'{fallback_title} #{i+1}'}"
+                   for i, suggestion in enumerate(suggestions_list)]
+        
+        for header, suggestion in zip(headers, suggestions_list):
+            with st.expander(header):
+                for label, key, default, as_code in schema['fields']:
+                    value = suggestion.get(key, default)
+                    st.markdown(f"**{label}:** `{value}`" if as_code else f"**{label}:** {value}")
+                
+                for label, key, default in schema['sections']:
+                    st.markdown(f"**{label}:**")
+                    st.markdown(suggestion.get(key, default))
+                
+                for label, key in schema['code_blocks']:
+                    if key in suggestion:
+                        st.markdown(f"**{label}:**")
+                        st.code(suggestion[key], language=suggestion.get('language', 'text'))
+                
+                for label, key in schema['notes']:
+                    if key in suggestion:
+                        st.markdown(f"**{label}:**")
+                        st.markdown(suggestion[key])
+                
+                for label, key in schema['lists']:
+                    if key in suggestion and isinstance(suggestion[key], list):
+                        st.markdown(f"**{label}:**")
+                        for item in suggestion[key]:
+                            st.markdown(f"- {item}")
 
 def display_summary_tab(suggestions: Dict[str, Any]):
     """Display summary of all suggestions."""
     st.subheader("📊 Refactoring Summary")
     
-    # Count total suggestions across all categories
+    # Aggregate counts and high-priority rows in a single pass over all categories
     total_suggestions = 0
+    high_priority_categories = 0
+    quick_win_categories = 0
     category_counts = {}
+    high_priority_suggestions = []
     
     for category, data in suggestions.items():
-        if isinstance(data, dict) and 'suggestions' in data:
-            count = len(data['suggestions'])
-            category_counts[category] = count
-            total_suggestions += count
+        if not isinstance(data, dict):
+            continue
+        
+        high_priority_categories += data.get('high_priority_count', 0) > 0
+        quick_win_categories += data.get('quick_wins_count', 0) > 0
+        
+        if 'suggestions' not in data:
+            continue
+        
+        category_suggestions = data['suggestions']
+        category_counts[category] = len(category_suggestions)
+        total_suggestions += len(category_suggestions)
+        
+        category_title = category.replace('_', ' ').title()
+        for suggestion in category_suggestions:
+            if suggestion.get('priority') == 'High' or suggestion.get('severity') == 'High':
+                high_priority_suggestions.append({
+                    'Category': category_title,
+                    'Title': suggestion.get('title', 'Untitled'),
+                    'File': suggestion.get('file', 'Unknown'),
+                    'Impact': suggestion.get('impact', suggestion.get('risk_level', 'Medium'))
+                })
     
     # Display summary metrics
     col1, col2, col3, col4 = st.columns(4)
     col1.metric("Total Suggestions", total_suggestions)
     col2.metric("Categories Analyzed", len(category_counts))
-    col3.metric("High Priority", sum(1 for cat_data in suggestions.values() 
-                                   if isinstance(cat_data, dict) and cat_data.get('high_priority_count', 0) > 0))
-    col4.metric("Quick Wins", sum(1 for cat_data in suggestions.values() 
-                                if isinstance(cat_data, dict) and cat_data.get('quick_wins_count', 0) > 0))
+    col3.metric("High Priority", high_priority_categories)
+    col4.metric("Quick Wins", quick_win_categories)
     
     # Display category breakdown
     if category_counts:
         st.subheader("Suggestions by Category")
-        category_df = pd.DataFrame(list(category_counts.items()), columns=['Category', 'Suggestions'])
-        st.bar_chart(category_df.set_index('Category'))
+        st.bar_chart({'Suggestions': category_counts})
     
     # Display top priority suggestions
     st.subheader("🎯 Top Priority Recommendations")
     
-    high_priority_suggestions = []
-    for category, data in suggestions.items():
-        if isinstance(data, dict) and 'suggestions' in data:
-            for suggestion in data['suggestions']:
-                if suggestion.get('priority') == 'High' or suggestion.get('severity') == 'High':
-                    high_priority_suggestions.append({
-                        'Category': category.replace('_', ' ').title(),
-                        'Title': suggestion.get('title', 'Untitled'),
-                        'File': suggestion.get('file', 'Unknown'),
-                        'Impact': suggestion.get('impact', suggestion.get('risk_level', 'Medium'))
-                    })
-    
     if high_priority_suggestions:
-        priority_df = pd.DataFrame(high_priority_suggestions)
-        st.dataframe(priority_df, use_container_width=True)
+        st.dataframe(high_priority_suggestions, use_container_width=True)
     else:
         st.info("No high-priority issues found. Great job!")
 
+@st.fragment(run_every=REPORT_POLL_INTERVAL)
+def display_report_progress(report_key: str):
+    """Poll a running report, rerunning the app once it has finished."""
+    future = st.session_state.report_futures.get(report_key)
+    if future is None or future.done():
+        # App-scope reruns are valid from any run, unlike scope="fragment"
+        st.rerun()
+    
+    st.info(f"⏳ Generating {report_key} report...")
+
+def display_report_download(report_key: str, button_label: str, report_fn, report_args: tuple,
+                            download_label: str, file_name: str, mime: str):
+    """Display a report's generate/download buttons, polling while it is still generating."""
+    report_futures = st.session_state.setdefault('report_futures', {})
+    
+    if st.button(button_label) and report_key not in report_futures:
+        report_futures[report_key] = get_report_executor().submit(report_fn, *report_args)
+    
+    future = report_futures.get(report_key)
+    if future is None:
+        return
+    
+    if not future.done():
+        display_report_progress(report_key)
+        return
+    
+    try:
+        report_data = future.result()
+    except Exception as e:
+        st.error(f"Error generating {report_key}: {str(e)}")
+        del report_futures[report_key]
+        return
+    
+    st.download_button(
+        label=download_label,
+        data=report_data,
+        file_name=file_name,
+        mime=mime
+    )
+
+@st.fragment
 def display_export_tab():
     """Display export options for refactoring suggestions."""
     st.subheader("💾 Export Refactoring Report")
     
+    suggestions = st.session_state.refactor_suggestions
+    repo_info = st.session_state.repo_info
+    analysis_options = st.session_state.analysis_options
+    
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        if st.button("📄 Generate PDF Report"):
-            try:
-                pdf_buffer = report_gen.generate_pdf_report(
-                    st.session_state.refactor_suggestions,
-                    st.session_state.repo_info,
-                    st.session_state.analysis_options
-                )
-                
-                st.download_button(
-                    label="💾 Download PDF Report",
-                    data=pdf_buffer.getvalue(),
-                    file_name=f"{st.session_state.repo_info['name']}_refactoring_report.pdf",
-                    mime="application/pdf"
-                )
-                
-            except Exception as e:
-                st.error(f"Error generating PDF: {str(e)}")
+        display_report_download(
+            "PDF", "📄 Generate PDF Report",
+            generate_pdf_report, (suggestions, repo_info, analysis_options),
+            "💾 Download PDF Report",
+            f"{repo_info['name']}_refactoring_report.pdf",
+            "application/pdf"
+        )
     
     with col2:
-        if st.button("📊 Generate Excel Report"):
-            try:
-                excel_buffer = report_gen.generate_excel_report(
-                    st.session_state.refactor_suggestions,
-                    st.session_state.repo_info
-                )
-                
-                st.download_button(
-                    label="💾 Download Excel Report",
-                    data=excel_buffer.getvalue(),
-                    file_name=f"{st.session_state.repo_info['name']}_refactoring_analysis.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                )
-                
-            except Exception as e:
-                st.error(f"Error generating Excel: {str(e)}")
+        display_report_download(
+            "Excel", "📊 Generate Excel Report",
+            generate_excel_report, (suggestions, repo_info),
+            "💾 Download Excel Report",
+            f"{repo_info['name']}_refactoring_analysis.xlsx",
+            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        )
     
     with col3:
-        if st.button("📝 Generate Markdown Report"):
-            try:
-                markdown_content = report_gen.generate_markdown_report(
-                    st.session_state.refactor_suggestions,
-                    st.session_state.repo_info,
-                    st.session_state.analysis_options
-                )
-                
-                st.download_button(
-                    label="💾 Download Markdown",
-                    data=markdown_content,
-                    file_name=f"{st.session_state.repo_info['name']}_refactoring_suggestions.md",
-                    mime="text/markdown"
-                )
-                
-            except Exception as e:
-                st.error(f"Error generating Markdown: {str(e)}")
+        display_report_download(
+            "Markdown", "📝 Generate Markdown Report",
+            generate_markdown_report, (suggestions, repo_info, analysis_options),
+            "💾 Download Markdown",
+            f"{repo_info['name']}_refactoring_suggestions.md",
+            "text/markdown"
+        )
     
     # Display JSON export option
     st.markdown("---")
     if st.button("📋 Copy Suggestions as JSON"):
-        json_data = json.dumps(st.session_state.refactor_suggestions, indent=2)
+        json_data = suggestions_to_json(st.session_state.refactor_suggestions)
         st.text_area("JSON Data (Copy this)", value=json_data, height=200)
 
 if __name__ == "__main__":
@@ -1,98 +1,147 @@
 import os
+import ast
 import json
+import queue
 import logging
-from typing import Dict, List, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Callable, Tuple
 from google import genai
 from google.genai import types
 
-# Global Gemini client
+# Global Gemini client and the API key it was created with
 gemini_client = None
+gemini_api_key = None
 
-def initialize_gemini(api_key: str):
-    """Initialize the Gemini client."""
-    global gemini_client
-    gemini_client = genai.Client(api_key=api_key)
-
-def build_refactoring_prompt(repo_structure: Dict, analysis_options: Dict, repo_info: Dict) -> str:
-    """Build a comprehensive prompt for refactoring analysis."""
-    
-    # Repository overview
-    stats = repo_structure['statistics']
-    overview = f"""## Repository Analysis for Refactoring
+# Bump when the prompt or response schema changes so cached analyses are regenerated
+PROMPT_VERSION = 5
 
-**Repository:** {repo_info['full_name']}
-**Main Language:** {repo_info['language']}
-**Description:** {repo_info['description']}
+# Output cap for a single analysis response; 100k exceeded the model's own limit
+MAX_OUTPUT_TOKENS = 32768
 
-**Codebase Statistics:**
-- Total files analyzed: {stats['analyzed_files']}
-- Code files: {stats['code_files']}
-- Primary languages: {', '.join(stats['languages'].keys())}
-- Complexity distribution: {stats.get('complexity_distribution', {})}
-
-"""
-    
-    # Add file contents with priority ordering
-    files_content = "## Source Code Files for Analysis:\n\n"
-    
-    # Sort files by priority and complexity
-    sorted_files = sorted(
-        repo_structure['analyzed_files'].items(),
-        key=lambda x: (not x[1]['is_priority'], -x[1]['complexity_score'], -x[1]['size'])
-    )
-    
-    # Include top files for analysis
-    for file_path, file_data in sorted_files[:50]:  # Analyze top 50 files
-        files_content += f"### File: `{file_path}`\n"
-        files_content += f"- **Type:** {file_data['type']}\n"
-        files_content += f"- **Size:** {file_data['size']} bytes\n"
-        files_content += f"- **Complexity Score:** {file_data['complexity_score']}/100\n"
-        files_content += f"- **Priority File:** {'Yes' if file_data['is_priority'] else 'No'}\n\n"
-        
-        # Include file content (truncate if too long)
-        content = file_data['content']
-        if len(content) > 20000:  # Truncate very long files
-            content = content[:10000] + "\n\n... [File truncated for analysis] ...\n\n" + content[-10000:]
-        
-        files_content += f"```{file_data['type'].lstrip('.')}\n{content}\n```\n\n"
-    
-    # Build analysis focus areas
-    focus_areas = []
-    if analysis_options.get('performance'):
-        focus_areas.append("**Performance Optimizations:** Identify slow algorithms, inefficient loops, unnecessary API calls, memory leaks, and optimization opportunities")
-    if analysis_options.get('maintainability'):
-        focus_areas.append("**Code Maintainability:** Find complex functions, improve naming, reduce code duplication, enhance readability")
-    if analysis_options.get('design_patterns'):
-        focus_areas.append("**Design Patterns:** Suggest better architectural patterns, SOLID principles, separation of concerns")
-    if analysis_options.get('code_quality'):
-        focus_areas.append("**Code Quality:** Identify code smells, improve error handling, enhance documentation")
-    if analysis_options.get('security'):
-        focus_areas.append("**Security Issues:** Find vulnerabilities like SQL injection, XSS, insecure authentication, data exposure")
-    if analysis_options.get('modularity'):
-        focus_areas.append("**Modularity:** Improve separation of concerns, reduce coupling, increase cohesion")
-    
-    # Build the main prompt
-    main_prompt = f"""{overview}
+# Files sent to Gemini per analysis, and how they are split into concurrent requests
+MAX_PROMPT_FILES = 50
+FILES_PER_BATCH = 8
+MAX_CONCURRENT_BATCHES = 8
 
-{files_content}
+# Python files at or below this complexity score are sent as an outline instead of full source
+OUTLINE_COMPLEXITY_THRESHOLD = 40
 
-## Refactoring Analysis Request
+# Response schema building blocks for structured JSON output
+_STRING = {'type': 'STRING'}
+_NUMBER = {'type': 'NUMBER'}
+_INTEGER = {'type': 'INTEGER'}
+_STRING_LIST = {'type': 'ARRAY', 'items': _STRING}
 
-As a senior software architect and code review expert, analyze the provided codebase and generate specific, actionable refactoring suggestions focusing on:
+def _suggestions_schema(fields: List[str], list_fields: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Build the schema for a list of suggestion objects."""
+    properties = {field: _STRING for field in fields}
+    properties.update({field: _STRING_LIST for field in list_fields or []})
+    return {'type': 'ARRAY', 'items': {'type': 'OBJECT', 'properties': properties}}
 
-{chr(10).join(focus_areas)}
+# Response schema for each analysis category, mirroring the JSON structure in the prompt
+CATEGORY_RESPONSE_SCHEMAS = {
+    'performance': {
+        'type': 'OBJECT',
+        'properties': {
+            'overall_score': _NUMBER,
+            'issues_count': _INTEGER,
+            'optimizable_files': _INTEGER,
+            'suggestions': _suggestions_schema(
+                ['title', 'file', 'priority', 'impact', 'description', 'before_code', 'after_code',
+                 'explanation', 'language']
+            )
+        }
+    },
+    'maintainability': {
+        'type': 'OBJECT',
+        'properties': {
+            'metrics': {
+                'type': 'OBJECT',
+                'properties': {
+                    'maintainability_index': _STRING,
+                    'complex_functions': _INTEGER,
+                    'long_files': _INTEGER,
+                    'duplicate_percentage': _STRING
+                }
+            },
+            'suggestions': _suggestions_schema(
+                ['title', 'file', 'category', 'effort', 'description', 'current_approach',
+                 'improved_approach', 'language'],
+                ['benefits']
+            )
+        }
+    },
+    'design_patterns': {
+        'type': 'OBJECT',
+        'properties': {
+            'patterns_found': _suggestions_schema(['pattern', 'file', 'quality']),
+            'suggestions': _suggestions_schema(
+                ['pattern_name', 'file', 'complexity', 'current_structure', 'recommended_pattern',
+                 'example_implementation', 'language'],
+                ['benefits']
+            )
+        }
+    },
+    'code_quality': {
+        'type': 'OBJECT',
+        'properties': {
+            'quality_score': _NUMBER,
+            'code_smells_count': _INTEGER,
+            'style_issues': _INTEGER,
+            'suggestions': _suggestions_schema(
+                ['title', 'file', 'issue_type', 'severity', 'description', 'problematic_code',
+                 'improved_code', 'explanation', 'language']
+            )
+        }
+    },
+    'security': {
+        'type': 'OBJECT',
+        'properties': {
+            'security_score': _NUMBER,
+            'vulnerabilities_count': _INTEGER,
+            'high_risk_issues': _INTEGER,
+            'suggestions': _suggestions_schema(
+                ['title', 'file', 'risk_level', 'vulnerability_type', 'description', 'vulnerable_code',
+                 'secure_code', 'language'],
+                ['mitigation_steps']
+            )
+        }
+    },
+    'modularity': {
+        'type': 'OBJECT',
+        'properties': {
+            'cohesion_score': _NUMBER,
+            'coupling_issues': _INTEGER,
+            'modules_count': _INTEGER,
+            'suggestions': _suggestions_schema(
+                ['title', 'file', 'issue_type', 'impact', 'current_structure', 'recommended_refactoring',
+                 'example_refactoring', 'language'],
+                ['benefits']
+            )
+        }
+    }
+}
 
-## Required Output Format (JSON):
+def initialize_gemini(api_key: str):
+    """Initialize the Gemini client, reusing the existing one for the same API key."""
+    global gemini_client, gemini_api_key
+    if gemini_client is None or gemini_api_key != api_key:
+        gemini_client = genai.Client(api_key=api_key)
+        gemini_api_key = api_key
 
-Provide your analysis in the following JSON structure:
+# Focus area description for each analysis category
+FOCUS_AREAS = {
+    'performance': "**Performance Optimizations:** Identify slow algorithms, inefficient loops, unnecessary API calls, memory leaks, and optimization opportunities",
+    'maintainability': "**Code Maintainability:** Find complex functions, improve naming, reduce code duplication, enhance readability",
+    'design_patterns': "**Design Patterns:** Suggest better architectural patterns, SOLID principles, separation of concerns",
+    'code_quality': "**Code Quality:** Identify code smells, improve error handling, enhance documentation",
+    'security': "**Security Issues:** Find vulnerabilities like SQL injection, XSS, insecure authentication, data exposure",
+    'modularity': "**Modularity:** Improve separation of concerns, reduce coupling, increase cohesion"
+}
 
-"""
-    
-    # Add JSON structure based on selected options
-    json_structure = "{\n"
-    
-    if analysis_options.get('performance'):
-        json_structure += '''  "performance": {
+# JSON output structure for each analysis category
+CATEGORY_JSON_STRUCTURES = {
+    'performance': '''  "performance": {
     "overall_score": 0-10,
     "issues_count": number,
     "optimizable_files": number,
@@ -109,11 +158,8 @@ Provide your analysis in the following JSON structure:
         "language": "programming_language"
       }
     ]
-  },
-'''
-    
-    if analysis_options.get('maintainability'):
-        json_structure += '''  "maintainability": {
+  }''',
+    'maintainability': '''  "maintainability": {
     "metrics": {
       "maintainability_index": "score",
       "complex_functions": number,
@@ -133,11 +179,8 @@ Provide your analysis in the following JSON structure:
         "language": "programming_language"
       }
     ]
-  },
-'''
-    
-    if analysis_options.get('design_patterns'):
-        json_structure += '''  "design_patterns": {
+  }''',
+    'design_patterns': '''  "design_patterns": {
     "patterns_found": [
       {
         "pattern": "Pattern name",
@@ -157,11 +200,8 @@ Provide your analysis in the following JSON structure:
         "language": "programming_language"
       }
     ]
-  },
-'''
-    
-    if analysis_options.get('code_quality'):
-        json_structure += '''  "code_quality": {
+  }''',
+    'code_quality': '''  "code_quality": {
     "quality_score": 0-10,
     "code_smells_count": number,
     "style_issues": number,
@@ -178,11 +218,8 @@ Provide your analysis in the following JSON structure:
         "language": "programming_language"
       }
     ]
-  },
-'''
-    
-    if analysis_options.get('security'):
-        json_structure += '''  "security": {
+  }''',
+    'security': '''  "security": {
     "security_score": 0-10,
     "vulnerabilities_count": number,
     "high_risk_issues": number,
@@ -199,11 +236,8 @@ Provide your analysis in the following JSON structure:
         "language": "programming_language"
       }
     ]
-  },
-'''
-    
-    if analysis_options.get('modularity'):
-        json_structure += '''  "modularity": {
+  }''',
+    'modularity': '''  "modularity": {
     "cohesion_score": 0-10,
     "coupling_issues": number,
     "modules_count": number,
@@ -220,65 +254,358 @@ Provide your analysis in the following JSON structure:
         "language": "programming_language"
       }
     ]
-  },
-'''
-    
-    # Remove trailing comma and close JSON
-    json_structure = json_structure.rstrip(',\n')
-    json_structure += "\n}"
-    
-    # Complete the prompt
-    complete_prompt = main_prompt + json_structure + """
+  }'''
+}
+
+# Repository-independent instructions. Every category is always listed so this prefix is
+# identical across requests and can be served from Gemini's prompt cache.
+STATIC_PROMPT = """## Refactoring Analysis Request
+
+As a senior software architect and code review expert, analyze the provided codebase and generate specific, actionable refactoring suggestions. The available analysis areas are:
+
+""" + "\n".join(FOCUS_AREAS.values()) + """
+
+## Required Output Format (JSON):
+
+Provide your analysis in the following JSON structure:
+
+{
+""" + ",\n".join(CATEGORY_JSON_STRUCTURES.values()) + """
+}
 
 ## Important Instructions:
-- Focus ONLY on the specific analysis areas selected
+- Focus ONLY on the analysis areas marked as selected in the repository section, and include only their sections in the JSON
 - Provide concrete, actionable suggestions with code examples
 - Include specific file paths and line numbers when possible
 - Prioritize high-impact improvements
 - Ensure all JSON is properly formatted and complete
 - Be specific and technical in your recommendations
+- Files marked as outlines keep all module- and class-level code, decorators, signatures and docstrings but omit function bodies; take code examples from files with full source
+"""
+
+def _without_docstring(body: List[ast.stmt]) -> List[ast.stmt]:
+    """Return a module or class body without its leading docstring statement."""
+    if body and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant) \
+            and isinstance(body[0].value.value, str):
+        return body[1:]
+    return body
+
+def _outline_python_definition(node: ast.AST, lines: List[str], outline: List[str]):
+    """Append the decorators, signature, docstring summary and class-level code of a Python def or class."""
+    start = min([decorator.lineno for decorator in node.decorator_list] + [node.lineno])
+    header_end = max(node.body[0].lineno - 1, node.lineno)
+    outline.extend(lines[start - 1:header_end])
+    
+    indent = ' ' * (node.col_offset + 4)
+    docstring = ast.get_docstring(node)
+    if docstring:
+        outline.append(f'{indent}"""{docstring.splitlines()[0]}"""')
+    
+    # Function bodies are omitted; class bodies keep attributes and other statements verbatim
+    members = _without_docstring(node.body) if isinstance(node, ast.ClassDef) else []
+    for member in members:
+        if isinstance(member, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            _outline_python_definition(member, lines, outline)
+        else:
+            outline.extend(lines[member.lineno - 1:member.end_lineno])
+    if not members and node.body[0].lineno > node.lineno:
+        outline.append(f"{indent}...")
+
+def build_file_outline(content: str, file_type: str) -> Optional[str]:
+    """Build a compact outline of a Python file, or None if no reliable outline can be built.
+    
+    Module-level code such as settings, route registrations and imports is kept verbatim so
+    security-relevant values survive; only function bodies are replaced.
+    """
+    if file_type != '.py':
+        return None
+    
+    try:
+        tree = ast.parse(content)
+    except (SyntaxError, ValueError):
+        return None
+    
+    lines = content.splitlines()
+    outline = []
+    docstring = ast.get_docstring(tree)
+    if docstring:
+        outline.append(f'"""{docstring.splitlines()[0]}"""')
+    
+    for node in _without_docstring(tree.body):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            _outline_python_definition(node, lines, outline)
+        else:
+            outline.extend(lines[node.lineno - 1:node.end_lineno])
+    
+    return "\n".join(outline) if outline else None
+
+def select_files_for_analysis(repo_structure: Dict) -> List[Tuple[str, Dict]]:
+    """Select the top files for analysis, ordered by priority and complexity."""
+    sorted_files = sorted(
+        repo_structure['analyzed_files'].items(),
+        key=lambda x: (not x[1]['is_priority'], -x[1]['complexity_score'], -x[1]['size'])
+    )
+    return sorted_files[:MAX_PROMPT_FILES]
+
+def build_refactoring_prompt(repo_structure: Dict, analysis_options: Dict, repo_info: Dict,
+                             files: Optional[List[Tuple[str, Dict]]] = None) -> List[str]:
+    """Build the refactoring prompt as [static instructions, repository-specific content].
+    
+    ``files`` limits the prompt to a subset of the selected files; by default all are included.
+    """
+    if files is None:
+        files = select_files_for_analysis(repo_structure)
+    
+    # Selected analysis areas
+    selected_areas = "## Selected Analysis Areas\n\n" + "\n".join(
+        f"- {category}: {'selected' if analysis_options.get(category) else 'not selected'}"
+        for category in FOCUS_AREAS
+    ) + "\n\n"
+    
+    # Repository overview
+    stats = repo_structure['statistics']
+    overview = f"""## Repository Analysis for Refactoring
+
+**Repository:** {repo_info['full_name']}
+**Main Language:** {repo_info['language']}
+**Description:** {repo_info['description']}
+
+**Codebase Statistics:**
+- Total files analyzed: {stats['analyzed_files']}
+- Code files: {stats['code_files']}
+- Primary languages: {', '.join(stats['languages'].keys())}
+- Complexity distribution: {stats.get('complexity_distribution', {})}
 
-Generate your refactoring analysis now.
 """
     
-    return complete_prompt
+    # Collect fragments in one list and join once instead of growing a string
+    parts = [selected_areas, overview, "## Source Code Files for Analysis:\n\n"]
+    
+    # Add file contents with priority ordering
+    for file_path, file_data in files:
+        parts.append(
+            f"### File: `{file_path}`\n"
+            f"- **Type:** {file_data['type']}\n"
+            f"- **Size:** {file_data['size']} bytes\n"
+            f"- **Complexity Score:** {file_data['complexity_score']}/100\n"
+            f"- **Priority File:** {'Yes' if file_data['is_priority'] else 'No'}\n"
+        )
+        
+        # Send simple files as an outline; include the rest in full (truncate if too long)
+        content = file_data['content']
+        outline = None
+        if file_data['complexity_score'] <= OUTLINE_COMPLEXITY_THRESHOLD:
+            outline = build_file_outline(content, file_data['type'])
+        
+        if outline:
+            parts.append("- **Content:** Outline only\n\n")
+            content = outline
+        else:
+            parts.append("\n")
+            if len(content) > 20000:  # Truncate very long files
+                content = content[:10000] + "\n\n... [File truncated for analysis] ...\n\n" + content[-10000:]
+        
+        parts.append(f"```{file_data['type'].lstrip('.')}\n{content}\n```\n\n")
+    
+    parts.append("Generate your refactoring analysis now.\n")
+    dynamic_prompt = "".join(parts)
+    
+    return [STATIC_PROMPT, dynamic_prompt]
+
+def build_response_schema(analysis_options: Dict) -> Dict[str, Any]:
+    """Build a response schema covering every enabled analysis category."""
+    categories = [category for category in CATEGORY_RESPONSE_SCHEMAS if analysis_options.get(category)]
+    return {
+        'type': 'OBJECT',
+        'properties': {category: CATEGORY_RESPONSE_SCHEMAS[category] for category in categories},
+        'required': categories
+    }
+
+_json_decoder = json.JSONDecoder()
+
+def parse_completed_sections(buffer: str, position: int, on_section: Callable[[str, Any], None]) -> int:
+    """Report top-level JSON sections that have fully arrived in a streamed buffer.
+    
+    Returns the position to resume scanning from once more text has arrived.
+    """
+    while True:
+        # Skip the opening brace, separators and whitespace between sections
+        while position < len(buffer) and buffer[position] in ' \t\r\n{,':
+            position += 1
+        
+        if position >= len(buffer) or buffer[position] != '"':
+            return position
+        
+        try:
+            key, key_end = _json_decoder.raw_decode(buffer, position)
+            value_start = buffer.index(':', key_end) + 1
+            while value_start < len(buffer) and buffer[value_start] in ' \t\r\n':
+                value_start += 1
+            value, value_end = _json_decoder.raw_decode(buffer, value_start)
+        except ValueError:
+            # Section is still incomplete
+            return position
+        
+        # A trailing scalar may still be growing until something follows it
+        if value_end >= len(buffer):
+            return position
+        
+        on_section(key, value)
+        position = value_end
 
-def generate_refactor_suggestions(repo_structure: Dict, analysis_options: Dict, repo_info: Dict) -> Dict[str, Any]:
-    """Generate refactoring suggestions using Gemini."""
+def parse_suggestions_response(response_text: Optional[str]) -> Dict[str, Any]:
+    """Parse a Gemini JSON response into a suggestions dict."""
+    if not response_text:
+        logging.error("Empty response from Gemini")
+        return {"error": "Empty response from AI service"}
+    
     try:
-        # Build the analysis prompt
-        prompt = build_refactoring_prompt(repo_structure, analysis_options, repo_info)
+        return json.loads(response_text)
+    except json.JSONDecodeError as e:
+        logging.error(f"Failed to parse Gemini response as JSON: {e}")
+        # Return a fallback structure
+        return {
+            "error": "Failed to parse AI response",
+            "raw_response": response_text[:1000] + "..." if len(response_text) > 1000 else response_text
+        }
+
+def merge_suggestions(results: List[Dict[str, Any]], weights: List[int]) -> Dict[str, Any]:
+    """Merge suggestion dicts from several batches.
+    
+    Lists are concatenated and nested dicts merged recursively. ``*_score`` values become
+    means weighted by batch size, other numbers are summed, and any other value is taken
+    from the first batch that has it.
+    """
+    merged = {}
+    keys = dict.fromkeys(key for result in results for key in result)
+    
+    for key in keys:
+        present = [(result[key], weight) for result, weight in zip(results, weights) if key in result]
+        values = [value for value, _ in present]
         
-        # Generate suggestions with Gemini
-        response = gemini_client.models.generate_content(
+        if len(values) == 1:
+            merged[key] = values[0]
+        elif all(isinstance(value, list) for value in values):
+            merged[key] = [item for value in values for item in value]
+        elif all(isinstance(value, dict) for value in values):
+            merged[key] = merge_suggestions(values, [weight for _, weight in present])
+        elif all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in values):
+            if key.endswith('_score'):
+                total_weight = sum(weight for _, weight in present)
+                score = round(sum(value * weight for value, weight in present) / total_weight, 1)
+                merged[key] = int(score) if score.is_integer() else score
+            else:
+                merged[key] = sum(values)
+        else:
+            merged[key] = values[0]
+    
+    return merged
+
+def stream_suggestions(prompt: List[str], analysis_options: Dict,
+                       on_section: Optional[Callable[[str, Any], None]] = None) -> Dict[str, Any]:
+    """Stream one Gemini analysis request, reporting each top-level section as it completes."""
+    try:
+        stream = gemini_client.models.generate_content_stream(
             model="gemini-2.5-pro",
             contents=prompt,
             config=types.GenerateContentConfig(
                 response_mime_type="application/json",
+                response_schema=build_response_schema(analysis_options),
                 temperature=0.3,
-                max_output_tokens=100000
+                max_output_tokens=MAX_OUTPUT_TOKENS
             )
         )
         
-        if response.text:
-            try:
-                # Parse the JSON response
-                suggestions = json.loads(response.text)
-                return suggestions
-            except json.JSONDecodeError as e:
-                logging.error(f"Failed to parse Gemini response as JSON: {e}")
-                # Return a fallback structure
-                return {
-                    "error": "Failed to parse AI response",
-                    "raw_response": response.text[:1000] + "..." if len(response.text) > 1000 else response.text
-                }
-        else:
-            logging.error("Empty response from Gemini")
-            return {"error": "Empty response from AI service"}
+        sections = {}
+        
+        def collect_section(key: str, value: Any):
+            sections[key] = value
+            if on_section:
+                on_section(key, value)
+        
+        # Only the text after the last completed section is kept for rescanning
+        chunks = []
+        pending = ""
+        for chunk in stream:
+            if not chunk.text:
+                continue
+            chunks.append(chunk.text)
+            pending += chunk.text
             
+            # Only rescan when a section could have just closed
+            if '}' in chunk.text:
+                pending = pending[parse_completed_sections(pending, 0, collect_section):]
+        
+        pending = pending[parse_completed_sections(pending, 0, collect_section):]
+        
+        # Sections were decoded as they arrived; only parse the whole text again if anything is left over
+        if sections and pending.strip() == '}':
+            return sections
+        
+        return parse_suggestions_response("".join(chunks))
+        
     except Exception as e:
         logging.error(f"Error generating refactor suggestions: {e}")
         return {
             "error": f"Failed to generate suggestions: {str(e)}",
             "suggestions": []
-        }
\ No newline at end of file
+        }
+
+def generate_refactor_suggestions(repo_structure: Dict, analysis_options: Dict, repo_info: Dict,
+                                  on_section: Optional[Callable[[str, Any], None]] = None) -> Dict[str, Any]:
+    """Generate refactoring suggestions for all enabled categories.
+    
+    The selected files are split into batches of ``FILES_PER_BATCH`` that are analyzed by
+    concurrent streaming Gemini requests sharing the same prompt prefix, then merged.
+    ``on_section`` is called on the calling thread with a category's merged results each
+    time a batch completes that category.
+    """
+    files = select_files_for_analysis(repo_structure)
+    batches = [files[i:i + FILES_PER_BATCH] for i in range(0, len(files), FILES_PER_BATCH)] or [[]]
+    weights = [max(len(batch), 1) for batch in batches]
+    
+    # Worker threads report completed sections through a queue so callbacks run on this thread
+    sections = queue.Queue()
+    partial_results = [{} for _ in batches]
+    
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_BATCHES) as executor:
+        futures = [
+            executor.submit(
+                stream_suggestions,
+                build_refactoring_prompt(repo_structure, analysis_options, repo_info, batch),
+                analysis_options,
+                (lambda category, data, index=index: sections.put((index, category, data))) if on_section else None
+            )
+            for index, batch in enumerate(batches)
+        ]
+        
+        while on_section and not (all(future.done() for future in futures) and sections.empty()):
+            try:
+                index, category, data = sections.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            
+            partial_results[index][category] = data
+            category_results = [result for result in partial_results if category in result]
+            on_section(category, merge_suggestions(
+                [{category: result[category]} for result in category_results],
+                [weight for result, weight in zip(partial_results, weights) if category in result]
+            )[category])
+        
+        results = [future.result() for future in futures]
+    
+    # Merge successful batches, keeping any errors alongside them
+    succeeded = [(result, weight) for result, weight in zip(results, weights) if 'error' not in result]
+    errors = [result['error'] for result in results if 'error' in result]
+    
+    if not succeeded:
+        return {
+            "error": "; ".join(errors),
+            "suggestions": []
+        }
+    
+    suggestions = merge_suggestions([result for result, _ in succeeded], [weight for _, weight in succeeded])
+    if errors:
+        suggestions['error'] = "; ".join(errors)
+    
+    return suggestions
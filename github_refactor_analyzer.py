@@ -3,17 +3,57 @@ import re
 import requests
 import json
 import logging
-from typing import Dict, List, Optional, Any
+import posixpath
+import tarfile
+import diskcache
+from urllib.parse import quote
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Dict, List, Optional, Any, Tuple
 
 # Global variables for API clients
 github_session = None
 github_headers = {}
 
+# Maximum number of concurrent GitHub requests (also the connection pool size)
+MAX_FETCH_WORKERS = 32
+
+# (connect, read) timeout in seconds for every GitHub request
+GITHUB_TIMEOUT = (5, 30)
+
+# Retry transient server errors and secondary rate limits with exponential backoff
+GITHUB_RETRY = Retry(total=5, backoff_factor=0.3, status_forcelist=[429, 502, 503, 504], raise_on_status=False)
+
+# Repositories up to this total size are downloaded as one tarball instead of per-file requests
+TARBALL_MAX_BYTES = 20 * 1024 * 1024
+
+# Files larger than this are skipped without being downloaded
+MAX_FILE_BYTES = 200 * 1024
+
+# Leading bytes checked for a NUL to detect binary content
+BINARY_SNIFF_BYTES = 512
+
+# Last-seen ETag and body per directory listing URL, revalidated with conditional requests
+http_cache = diskcache.Cache('.cache/http')
+
+# File bodies keyed by git blob SHA, so files unchanged between commits need no request
+BLOB_CACHE_MAX_BYTES = 512 * 1024 * 1024
+blob_cache = diskcache.Cache('.cache/blobs', size_limit=BLOB_CACHE_MAX_BYTES,
+                             eviction_policy='least-recently-used')
+
 def initialize_clients(gemini_api_key: str, github_token: Optional[str] = None):
     """Initialize the GitHub client for repository analysis."""
     global github_session, github_headers
     
-    github_session = requests.Session()
+    # Reuse one session so pooled connections survive re-initialization
+    if github_session is None:
+        github_session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=MAX_FETCH_WORKERS, pool_maxsize=MAX_FETCH_WORKERS,
+                              max_retries=GITHUB_RETRY)
+        github_session.mount('https://', adapter)
+        github_session.mount('http://', adapter)
     
     # Set up headers for GitHub API
     github_headers = {
@@ -23,6 +63,9 @@ def initialize_clients(gemini_api_key: str, github_token: Optional[str] = None):
     if github_token:
         github_headers['Authorization'] = f'token {github_token}'
 
+# Owner and repository name from a GitHub URL
+GITHUB_URL_RE = re.compile(r'github\.com/([^/]+)/([^/]+?)(?:\.git)?/?$')
+
 # Supported file extensions for refactoring analysis
 REFACTOR_EXTENSIONS = {
     '.py', '.js', '.ts', '.jsx', '.tsx', '.mjs', '.cjs', '.java', '.cpp', '.c', '.h',
@@ -40,6 +83,12 @@ PRIORITY_REFACTOR_FILES = {
     'dockerfile', 'makefile', 'gruntfile.js', 'gulpfile.js'
 }
 
+# Lowercased priority file names for case-insensitive lookup
+PRIORITY_FILES_LOWER = frozenset(f.lower() for f in PRIORITY_REFACTOR_FILES)
+
+# Configuration file extensions analyzed when config files are included
+CONFIG_EXTENSIONS = frozenset({'.json', '.yaml', '.yml', '.toml'})
+
 # Files and directories to skip
 SKIP_REFACTOR_PATTERNS = {
     '.git', '.github', '.vscode', '.idea', 'node_modules', '__pycache__',
@@ -54,36 +103,36 @@ TEST_PATTERNS = {
     '_test.', '_spec.', 'test_', 'spec_'
 }
 
+# Binary and media file extensions
+BINARY_EXTENSIONS = frozenset({
+    '.png', '.jpg', '.jpeg', '.gif', '.svg', '.ico',
+    '.pdf', '.zip', '.tar', '.gz', '.exe', '.dmg',
+    '.app', '.deb', '.rpm', '.msi', '.woff', '.woff2',
+    '.ttf', '.otf', '.mp3', '.mp4', '.avi', '.mov'
+})
+
+# Compiled substring matchers for the skip and test patterns
+SKIP_PATTERN_RE = re.compile('|'.join(re.escape(p) for p in SKIP_REFACTOR_PATTERNS), re.IGNORECASE)
+TEST_PATTERN_RE = re.compile('|'.join(re.escape(p) for p in TEST_PATTERNS), re.IGNORECASE)
+
 def should_skip_file_for_refactoring(path: str, include_tests: bool = False) -> bool:
     """Check if a file should be skipped for refactoring analysis."""
-    path_lower = path.lower()
-    
     # Always skip these patterns
-    for skip_pattern in SKIP_REFACTOR_PATTERNS:
-        if skip_pattern in path_lower:
-            return True
+    if SKIP_PATTERN_RE.search(path):
+        return True
     
     # Skip test files if not requested
-    if not include_tests:
-        for test_pattern in TEST_PATTERNS:
-            if test_pattern in path_lower:
-                return True
-    
-    # Skip binary and media files
-    if path_lower.endswith(('.png', '.jpg', '.jpeg', '.gif', '.svg', '.ico',
-                           '.pdf', '.zip', '.tar', '.gz', '.exe', '.dmg',
-                           '.app', '.deb', '.rpm', '.msi', '.woff', '.woff2',
-                           '.ttf', '.otf', '.mp3', '.mp4', '.avi', '.mov')):
+    if not include_tests and TEST_PATTERN_RE.search(path):
         return True
     
-    return False
+    # Skip binary and media files
+    return os.path.splitext(path)[1].lower() in BINARY_EXTENSIONS
 
 def validate_repository(github_url: str) -> Optional[Dict[str, str]]:
     """Validate and extract repository information from GitHub URL."""
     try:
         # Extract owner and repo name from URL
-        pattern = r'github\.com/([^/]+)/([^/]+?)(?:\.git)?/?$'
-        match = re.search(pattern, github_url)
+        match = GITHUB_URL_RE.search(github_url)
         
         if not match:
             return None
@@ -92,13 +141,23 @@ def validate_repository(github_url: str) -> Optional[Dict[str, str]]:
         
         # Fetch repository info via GitHub API
         api_url = f"https://api.github.com/repos/{owner}/{repo_name}"
-        response = github_session.get(api_url, headers=github_headers)
+        response = github_session.get(api_url, headers=github_headers, timeout=GITHUB_TIMEOUT)
         
         if response.status_code != 200:
             logging.error(f"GitHub API error: {response.status_code}")
             return None
         
         repo_data = response.json()
+        default_branch = repo_data.get('default_branch', 'main')
+        
+        # Resolve the head commit of the default branch so results can be cached per commit
+        default_sha = None
+        branch_response = github_session.get(f"{api_url}/branches/{default_branch}",
+                                             headers=github_headers, timeout=GITHUB_TIMEOUT)
+        if branch_response.status_code == 200:
+            default_sha = branch_response.json().get('commit', {}).get('sha')
+        else:
+            logging.warning(f"Could not resolve head commit for {default_branch}: {branch_response.status_code}")
         
         return {
             'owner': owner,
@@ -109,75 +168,223 @@ def validate_repository(github_url: str) -> Optional[Dict[str, str]]:
             'stars': repo_data.get('stargazers_count', 0),
             'forks': repo_data.get('forks_count', 0),
             'url': github_url,
-            'default_branch': repo_data.get('default_branch', 'main')
+            'default_branch': default_branch,
+            'default_sha': default_sha
         }
         
     except Exception as e:
         logging.error(f"Error validating repository: {e}")
         return None
 
+# Complexity indicator patterns per file type, lowercased once at import
+COMPLEXITY_PATTERNS = {
+    'js': ('function', 'class', 'if', 'for', 'while', 'switch', 'try', 'catch'),
+    'ts': ('function', 'class', 'interface', 'if', 'for', 'while', 'switch', 'try', 'catch'),
+    'py': ('def ', 'class ', 'if ', 'for ', 'while ', 'try:', 'except:', 'lambda'),
+    'java': ('public class', 'private', 'protected', 'if', 'for', 'while', 'switch', 'try', 'catch'),
+    'cpp': ('class', 'struct', 'if', 'for', 'while', 'switch', 'try', 'catch'),
+    'cs': ('class', 'struct', 'interface', 'if', 'for', 'while', 'switch', 'try', 'catch')
+}
+DEFAULT_COMPLEXITY_PATTERNS = ('function', 'class', 'if', 'for', 'while')
+
+# Complexity distribution buckets, indexed by score // 20 (100 falls in the last bucket)
+COMPLEXITY_BUCKETS = ('0-19', '20-39', '40-59', '60-79', '80-100')
+
 def get_file_complexity_score(content: str, file_type: str) -> int:
     """Calculate a simple complexity score for a file."""
     score = 0
-    lines = content.split('\n')
     
     # Base score on file length
-    score += min(len(lines) // 10, 50)  # Max 50 points for length
+    line_count = content.count('\n') + 1
+    score += min(line_count // 10, 50)  # Max 50 points for length
     
     # Add score for complexity indicators based on file type
-    complexity_patterns = {
-        'js': ['function', 'class', 'if', 'for', 'while', 'switch', 'try', 'catch'],
-        'ts': ['function', 'class', 'interface', 'if', 'for', 'while', 'switch', 'try', 'catch'],
-        'py': ['def ', 'class ', 'if ', 'for ', 'while ', 'try:', 'except:', 'lambda'],
-        'java': ['public class', 'private', 'protected', 'if', 'for', 'while', 'switch', 'try', 'catch'],
-        'cpp': ['class', 'struct', 'if', 'for', 'while', 'switch', 'try', 'catch'],
-        'cs': ['class', 'struct', 'interface', 'if', 'for', 'while', 'switch', 'try', 'catch']
-    }
-    
-    ext = file_type.lstrip('.')
-    patterns = complexity_patterns.get(ext, ['function', 'class', 'if', 'for', 'while'])
+    patterns = COMPLEXITY_PATTERNS.get(file_type.lstrip('.'), DEFAULT_COMPLEXITY_PATTERNS)
     
     content_lower = content.lower()
     for pattern in patterns:
-        score += content_lower.count(pattern.lower()) * 2
+        score += content_lower.count(pattern) * 2
     
     return min(score, 100)  # Cap at 100
 
-def fetch_repository_contents_recursive(owner: str, repo_name: str, path: str = "") -> List[Dict]:
-    """Recursively fetch repository contents."""
+def decode_text_content(data: bytes) -> Optional[str]:
+    """Decode file bytes as UTF-8, returning None for binary content."""
+    if b'\x00' in data[:BINARY_SNIFF_BYTES]:
+        return None
+    return data.decode('utf-8', errors='replace')
+
+def conditional_get(url: str, headers: Optional[Dict[str, str]] = None) -> tuple:
+    """GET a URL with If-None-Match, serving the cached body on 304 Not Modified.
+    
+    Returns the status code and raw response body (200 for cache hits).
+    """
+    request_headers = dict(headers or {})
+    cached = http_cache.get(url)
+    if cached:
+        request_headers['If-None-Match'] = cached[0]
+    
+    response = github_session.get(url, headers=request_headers, timeout=GITHUB_TIMEOUT)
+    
+    # 304 responses carry no body and do not count against the rate limit
+    if response.status_code == 304 and cached:
+        return 200, cached[1]
+    
+    if response.status_code == 200 and response.headers.get('ETag'):
+        http_cache.set(url, (response.headers['ETag'], response.content))
+    
+    return response.status_code, response.content
+
+def fetch_directory_contents(owner: str, repo_name: str, path: str = "", ref: str = "HEAD") -> Optional[List[Dict]]:
+    """Fetch the contents listing of a single repository directory at the given branch or commit.
+    
+    Returns None if the listing could not be fetched.
+    """
     try:
-        api_url = f"https://api.github.com/repos/{owner}/{repo_name}/contents/{path}"
-        response = github_session.get(api_url, headers=github_headers)
+        api_url = f"https://api.github.com/repos/{owner}/{repo_name}/contents/{path}?ref={ref}"
+        status_code, body = conditional_get(api_url, github_headers)
         
-        if response.status_code != 200:
-            logging.warning(f"Could not fetch contents for path {path}: {response.status_code}")
-            return []
+        if status_code != 200:
+            logging.warning(f"Could not fetch contents for path {path}: {status_code}")
+            return None
         
-        contents = response.json()
+        contents = json.loads(body)
         if not isinstance(contents, list):
             contents = [contents]
         
-        all_files = []
-        for item in contents:
-            if item['type'] == 'file':
-                all_files.append(item)
-            elif item['type'] == 'dir' and not should_skip_file_for_refactoring(item['path']):
-                # Recursively fetch directory contents
-                sub_files = fetch_repository_contents_recursive(owner, repo_name, item['path'])
-                all_files.extend(sub_files)
-        
-        return all_files
+        return contents
         
     except Exception as e:
         logging.warning(f"Error fetching contents for path {path}: {e}")
-        return []
+        return None
+
+def fetch_repository_contents_recursive(owner: str, repo_name: str, path: str = "", ref: str = "HEAD",
+                                         include_tests: bool = False) -> Tuple[List[Dict], int]:
+    """Recursively fetch repository contents at the given branch or commit, listing directories concurrently.
+    
+    Returns the files found and the number of directories that could not be listed.
+    """
+    all_files = []
+    failed_directories = 0
+    
+    with ThreadPoolExecutor(max_workers=MAX_FETCH_WORKERS) as executor:
+        pending = {executor.submit(fetch_directory_contents, owner, repo_name, path, ref)}
+        
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                contents = future.result()
+                if contents is None:
+                    failed_directories += 1
+                    continue
+                
+                for item in contents:
+                    if item['type'] == 'file':
+                        all_files.append(item)
+                    elif item['type'] == 'dir' and not should_skip_file_for_refactoring(item['path'], include_tests):
+                        # Queue subdirectory listing
+                        pending.add(executor.submit(fetch_directory_contents, owner, repo_name, item['path'], ref))
+    
+    return all_files, failed_directories
+
+def download_file_content(download_url: str, headers: Optional[Dict[str, str]] = None) -> Optional[bytes]:
+    """Download the raw bytes of a repository file, returning None if the request fails."""
+    try:
+        response = github_session.get(download_url, headers=headers, timeout=GITHUB_TIMEOUT)
+        if response.status_code != 200:
+            logging.warning(f"Could not fetch file {download_url}: {response.status_code}")
+            return None
+        return response.content
+        
+    except Exception as e:
+        logging.warning(f"Could not fetch file {download_url}: {e}")
+        return None
+
+def download_files_concurrently(files: List[Dict]) -> Dict[str, Optional[bytes]]:
+    """Download the given files with concurrent per-file requests."""
+    # Raw URLs built from the tree carry no token, so private repositories need the auth header
+    headers = {'Authorization': github_headers['Authorization']} if 'Authorization' in github_headers else None
+    
+    with ThreadPoolExecutor(max_workers=MAX_FETCH_WORKERS) as executor:
+        futures = {file_data['path']: executor.submit(download_file_content, file_data['download_url'], headers)
+                   for file_data in files}
+        return {path: future.result() for path, future in futures.items()}
+
+def download_files_from_tarball(owner: str, repo_name: str, ref: str, paths: set) -> Optional[Dict[str, bytes]]:
+    """Download the given files by streaming a single repository tarball.
+    
+    Returns None if the tarball could not be fetched or read.
+    """
+    try:
+        api_url = f"https://api.github.com/repos/{owner}/{repo_name}/tarball/{ref}"
+        with github_session.get(api_url, headers=github_headers, stream=True, timeout=GITHUB_TIMEOUT) as response:
+            if response.status_code != 200:
+                logging.warning(f"Could not fetch tarball for {ref}: {response.status_code}")
+                return None
+            
+            response.raw.decode_content = True
+            contents = {}
+            remaining = set(paths)
+            with tarfile.open(fileobj=response.raw, mode='r|gz') as tar:
+                for member in tar:
+                    if not member.isfile():
+                        continue
+                    
+                    # Member names are prefixed with a "<owner>-<repo>-<sha>/" directory
+                    path = member.name.split('/', 1)[-1]
+                    if path in remaining:
+                        remaining.discard(path)
+                        contents[path] = tar.extractfile(member).read()
+                        if not remaining:
+                            break
+            
+            return contents
+            
+    except Exception as e:
+        logging.warning(f"Error reading tarball for {ref}: {e}")
+        return None
 
-def fetch_repository_for_refactoring(github_url: str, options: Dict[str, Any]) -> Dict[str, Any]:
-    """Fetch repository files specifically for refactoring analysis."""
+def fetch_repository_tree(owner: str, repo_name: str, ref: str) -> Optional[List[Dict]]:
+    """Fetch the full file listing of a repository with a single Git Trees API call.
+    
+    Returns None if the tree could not be fetched or GitHub truncated it.
+    """
+    try:
+        api_url = f"https://api.github.com/repos/{owner}/{repo_name}/git/trees/{ref}?recursive=1"
+        response = github_session.get(api_url, headers=github_headers, timeout=GITHUB_TIMEOUT)
+        
+        if response.status_code != 200:
+            logging.warning(f"Could not fetch tree for {ref}: {response.status_code}")
+            return None
+        
+        tree_data = response.json()
+        if tree_data.get('truncated'):
+            logging.warning(f"Tree for {ref} is truncated, falling back to directory listing")
+            return None
+        
+        # Synthesize the same file entries the contents API returns
+        return [
+            {
+                'path': item['path'],
+                'name': posixpath.basename(item['path']),
+                'size': item.get('size', 0),
+                'type': 'file',
+                'sha': item['sha'],
+                'download_url': f"https://raw.githubusercontent.com/{owner}/{repo_name}/{ref}/{quote(item['path'])}"
+            }
+            for item in tree_data.get('tree', [])
+            # Symlinks are blobs too, but hold only the link target path
+            if item['type'] == 'blob' and item.get('mode') != '120000'
+        ]
+        
+    except Exception as e:
+        logging.warning(f"Error fetching tree for {ref}: {e}")
+        return None
+
+def fetch_repository_for_refactoring(github_url: str, options: Dict[str, Any], ref: str = "HEAD") -> Dict[str, Any]:
+    """Fetch repository files specifically for refactoring analysis at the given branch or commit."""
     try:
         # Extract owner and repo name
-        pattern = r'github\.com/([^/]+)/([^/]+?)(?:\.git)?/?$'
-        match = re.search(pattern, github_url)
+        match = GITHUB_URL_RE.search(github_url)
         if not match:
             raise ValueError("Invalid GitHub URL")
             
@@ -192,13 +399,19 @@ def fetch_repository_for_refactoring(github_url: str, options: Dict[str, Any]) -
                 'code_files': 0,
                 'analyzed_files': 0,
                 'skipped_files': 0,
+                'failed_files': 0,
+                'failed_directories': 0,
                 'languages': {},
                 'complexity_distribution': {}
             }
         }
         
-        # Fetch all files recursively
-        all_files = fetch_repository_contents_recursive(owner, repo_name)
+        # Fetch the full file listing, crawling directories only if the tree is unavailable
+        all_files = fetch_repository_tree(owner, repo_name, ref)
+        if all_files is None:
+            all_files, structure['statistics']['failed_directories'] = fetch_repository_contents_recursive(
+                owner, repo_name, ref=ref, include_tests=options.get('include_tests', False)
+            )
         
         # Process files
         files_to_analyze = []
@@ -212,11 +425,16 @@ def fetch_repository_for_refactoring(github_url: str, options: Dict[str, Any]) -
                 structure['statistics']['skipped_files'] += 1
                 continue
             
+            # Skip oversized files before spending bandwidth on them
+            if file_info['size'] > MAX_FILE_BYTES:
+                structure['statistics']['skipped_files'] += 1
+                continue
+            
             # Check if file is relevant for refactoring
             ext = os.path.splitext(file_name)[1].lower()
-            is_priority = file_name.lower() in [f.lower() for f in PRIORITY_REFACTOR_FILES]
+            is_priority = file_name.lower() in PRIORITY_FILES_LOWER
             is_code_file = ext in REFACTOR_EXTENSIONS
-            is_config = options.get('include_config', True) and (is_priority or ext in {'.json', '.yaml', '.yml', '.toml'})
+            is_config = options.get('include_config', True) and (is_priority or ext in CONFIG_EXTENSIONS)
             
             if not (is_code_file or is_config):
                 structure['statistics']['skipped_files'] += 1
@@ -228,6 +446,7 @@ def fetch_repository_for_refactoring(github_url: str, options: Dict[str, Any]) -
                 'size': file_info['size'],
                 'type': ext,
                 'download_url': file_info['download_url'],
+                'sha': file_info.get('sha'),
                 'is_priority': is_priority,
                 'complexity_score': 0
             }
@@ -251,33 +470,66 @@ def fetch_repository_for_refactoring(github_url: str, options: Dict[str, Any]) -
         max_files = options.get('max_files', 60)  # Increased to support 50 file analysis
         files_to_analyze = files_to_analyze[:max_files]
         
-        # Fetch file contents
+        # Files unchanged since an earlier analysis are served from the blob cache
+        file_contents = {}
         for file_data in files_to_analyze:
-            try:
-                response = github_session.get(file_data['download_url'])
-                if response.status_code == 200:
-                    content = response.text
-                    complexity_score = get_file_complexity_score(content, file_data['type'])
-                    
-                    structure['analyzed_files'][file_data['path']] = {
-                        'content': content,
-                        'size': file_data['size'],
-                        'type': file_data['type'],
-                        'complexity_score': complexity_score,
-                        'is_priority': file_data['is_priority']
-                    }
-                    
-                    file_data['complexity_score'] = complexity_score
-                    structure['statistics']['analyzed_files'] += 1
-                    
-                    # Track complexity distribution
-                    complexity_range = f"{(complexity_score // 20) * 20}-{(complexity_score // 20) * 20 + 19}"
-                    structure['statistics']['complexity_distribution'][complexity_range] = \
-                        structure['statistics']['complexity_distribution'].get(complexity_range, 0) + 1
-                        
-            except Exception as e:
-                logging.warning(f"Could not fetch file {file_data['path']}: {e}")
+            body = blob_cache.get(file_data['sha']) if file_data['sha'] else None
+            if body is not None:
+                file_contents[file_data['path']] = body
+        missing_files = [file_data for file_data in files_to_analyze if file_data['path'] not in file_contents]
+        
+        if missing_files:
+            # Small repositories come down as one tarball; otherwise fetch files concurrently
+            downloaded = None
+            if sum(file_info['size'] for file_info in all_files) <= TARBALL_MAX_BYTES:
+                downloaded = download_files_from_tarball(
+                    owner, repo_name, ref, {file_data['path'] for file_data in missing_files}
+                )
+            if downloaded is None:
+                downloaded = download_files_concurrently(missing_files)
+            else:
+                # Retry files the tarball did not contain as regular files
+                leftover_files = [file_data for file_data in missing_files if file_data['path'] not in downloaded]
+                if leftover_files:
+                    downloaded.update(download_files_concurrently(leftover_files))
+            
+            for file_data in missing_files:
+                body = downloaded.get(file_data['path'])
+                if body is not None and file_data['sha']:
+                    blob_cache.set(file_data['sha'], body)
+                file_contents[file_data['path']] = body
+        
+        # Score files in priority order
+        complexity_distribution = Counter()
+        for file_data in files_to_analyze:
+            body = file_contents.get(file_data['path'])
+            if body is None:
+                structure['statistics']['failed_files'] += 1
+                continue
+            
+            # Binary content that slipped past the extension filter
+            content = decode_text_content(body)
+            if content is None:
                 structure['statistics']['skipped_files'] += 1
+                continue
+            
+            complexity_score = get_file_complexity_score(content, file_data['type'])
+            
+            structure['analyzed_files'][file_data['path']] = {
+                'content': content,
+                'size': file_data['size'],
+                'type': file_data['type'],
+                'complexity_score': complexity_score,
+                'is_priority': file_data['is_priority']
+            }
+            
+            file_data['complexity_score'] = complexity_score
+            structure['statistics']['analyzed_files'] += 1
+            
+            # Track complexity distribution
+            complexity_distribution[COMPLEXITY_BUCKETS[min(complexity_score // 20, 4)]] += 1
+        
+        structure['statistics']['complexity_distribution'] = dict(complexity_distribution)
         
         return structure
         
@@ -285,6 +537,11 @@ def fetch_repository_for_refactoring(github_url: str, options: Dict[str, Any]) -
         logging.error(f"Error fetching repository for refactoring: {e}")
         raise
 
+def is_fetch_complete(structure: Dict[str, Any]) -> bool:
+    """Check whether a fetched repository has analyzed files and no failed listings or downloads."""
+    stats = structure['statistics']
+    return stats['analyzed_files'] > 0 and not stats['failed_files'] and not stats['failed_directories']
+
 def get_language_from_extension(ext: str) -> str:
     """Get programming language from file extension."""
     language_map = {
@@ -315,53 +572,73 @@ def get_language_from_extension(ext: str) -> str:
     }
     return language_map.get(ext, 'text')
 
+# Function/class definition patterns per file type as (pattern after indentation, entity type).
+# The first capture group is the entity name.
+ENTITY_DEFINITIONS = {
+    '.py': [
+        (r'def\s+(\w+)\s*\(', 'function'),
+        (r'class\s+(\w+)', 'class'),
+        (r'async\s+def\s+(\w+)\s*\(', 'async_function')
+    ],
+    '.js': [
+        (r'function\s+(\w+)\s*\(', 'function'),
+        (r'class\s+(\w+)', 'class'),
+        (r'async\s+function\s+(\w+)\s*\(', 'async_function'),
+        (r'(\w+)\s*:\s*function\s*\(', 'method'),
+        (r'(\w+)\s*=>\s*{', 'arrow_function')
+    ],
+    '.ts': [
+        (r'function\s+(\w+)\s*\(', 'function'),
+        (r'class\s+(\w+)', 'class'),
+        (r'interface\s+(\w+)', 'interface'),
+        (r'async\s+function\s+(\w+)\s*\(', 'async_function')
+    ],
+    '.java': [
+        (r'public\s+class\s+(\w+)', 'class'),
+        (r'private\s+class\s+(\w+)', 'class'),
+        (r'public\s+\w+\s+(\w+)\s*\(', 'method'),
+        (r'private\s+\w+\s+(\w+)\s*\(', 'method')
+    ]
+}
+
+def _compile_entity_pattern(definitions: List[tuple]) -> re.Pattern:
+    """Compile a file type's definitions into one multiline alternation with per-entry named groups."""
+    alternatives = []
+    for index, (pattern, _) in enumerate(definitions):
+        # Whitespace must not span lines when matching against the whole buffer
+        pattern = pattern.replace(r'\s', r'[^\S\n]').replace(r'(\w+)', f'(?P<name{index}>\\w+)', 1)
+        alternatives.append(f'(?P<entity{index}>^(?P<indent{index}>[^\\S\\n]*){pattern})')
+    return re.compile('|'.join(alternatives), re.MULTILINE)
+
+# Compiled definition pattern and entity types per file type
+ENTITY_PATTERNS = {
+    file_type: (_compile_entity_pattern(definitions), [entity_type for _, entity_type in definitions])
+    for file_type, definitions in ENTITY_DEFINITIONS.items()
+}
+
 def extract_functions_and_classes(content: str, file_type: str) -> List[Dict[str, str]]:
     """Extract function and class definitions from code."""
-    entities = []
-    lines = content.split('\n')
-    
-    # Patterns for different languages
-    patterns = {
-        '.py': [
-            (r'^(\s*)def\s+(\w+)\s*\(', 'function'),
-            (r'^(\s*)class\s+(\w+)', 'class'),
-            (r'^(\s*)async\s+def\s+(\w+)\s*\(', 'async_function')
-        ],
-        '.js': [
-            (r'^(\s*)function\s+(\w+)\s*\(', 'function'),
-            (r'^(\s*)class\s+(\w+)', 'class'),
-            (r'^(\s*)async\s+function\s+(\w+)\s*\(', 'async_function'),
-            (r'^(\s*)(\w+)\s*:\s*function\s*\(', 'method'),
-            (r'^(\s*)(\w+)\s*=>\s*{', 'arrow_function')
-        ],
-        '.ts': [
-            (r'^(\s*)function\s+(\w+)\s*\(', 'function'),
-            (r'^(\s*)class\s+(\w+)', 'class'),
-            (r'^(\s*)interface\s+(\w+)', 'interface'),
-            (r'^(\s*)async\s+function\s+(\w+)\s*\(', 'async_function')
-        ],
-        '.java': [
-            (r'^(\s*)public\s+class\s+(\w+)', 'class'),
-            (r'^(\s*)private\s+class\s+(\w+)', 'class'),
-            (r'^(\s*)public\s+\w+\s+(\w+)\s*\(', 'method'),
-            (r'^(\s*)private\s+\w+\s+(\w+)\s*\(', 'method')
-        ]
-    }
+    if file_type not in ENTITY_PATTERNS:
+        return []
     
-    file_patterns = patterns.get(file_type, [])
+    pattern, entity_types = ENTITY_PATTERNS[file_type]
+    entities = []
+    line_number = 1
+    position = 0
     
-    for i, line in enumerate(lines):
-        for pattern, entity_type in file_patterns:
-            match = re.search(pattern, line)
-            if match:
-                indentation = len(match.group(1)) if match.group(1) else 0
-                name = match.group(2)
-                entities.append({
-                    'name': name,
-                    'type': entity_type,
-                    'line': i + 1,
-                    'indentation': indentation,
-                    'content': line.strip()
-                })
+    for match in pattern.finditer(content):
+        # Advance the line count incrementally; matches arrive in order
+        line_number += content.count('\n', position, match.start())
+        position = match.start()
+        
+        index = int(match.lastgroup[len('entity'):])
+        line_end = content.find('\n', position)
+        entities.append({
+            'name': match.group(f'name{index}'),
+            'type': entity_types[index],
+            'line': line_number,
+            'indentation': len(match.group(f'indent{index}')),
+            'content': content[position:line_end if line_end != -1 else len(content)].strip()
+        })
     
     return entities
@@ -2,7 +2,6 @@ import io
 import json
 from datetime import datetime
 from typing import Dict, Any, List
-import pandas as pd
 
 def generate_markdown_report(suggestions: Dict[str, Any], repo_info: Dict[str, str], analysis_options: Dict[str, bool]) -> str:
     """Generate a comprehensive markdown report of refactoring suggestions."""
@@ -480,6 +479,8 @@ Stars: {stars}"""
 
 def generate_excel_report(suggestions: Dict[str, Any], repo_info: Dict[str, str]) -> io.BytesIO:
     """Generate an Excel report with suggestions organized in sheets."""
+    import pandas as pd
+    
     buffer = io.BytesIO()
     
     with pd.ExcelWriter(buffer, engine='openpyxl') as writer: